@@ -5,10 +5,11 @@ Provides tools for text manipulation in Adobe InDesign via ExtendScript
 """
 
 import asyncio
-import subprocess
+import hashlib
 import json
-import os
-from typing import Any, Dict
+from pathlib import Path
+from string import Template
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
 from mcp.server import Server
 from mcp.server.stdio import stdio_server
 from mcp import types
@@ -16,350 +17,808 @@ from mcp import types
 
 app = Server("indesign-mcp")
 
+# InDesign application names to try, newest first
+INDESIGN_APPS = [
+    "Adobe InDesign 2025",
+    "Adobe InDesign 2024",
+    "Adobe InDesign 2023",
+    "Adobe InDesign CC 2024",
+    "Adobe InDesign CC 2023",
+    "Adobe InDesign"
+]
 
-@app.list_tools()
-async def list_tools() -> list[types.Tool]:
-    """List available InDesign text manipulation tools"""
-    return [
-        types.Tool(
-            name="add_text",
-            description="Add text to an InDesign document",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "text": {
-                        "type": "string",
-                        "description": "The text to add to the document"
-                    },
-                    "position": {
-                        "type": "string",
-                        "description": "Position to add text (start, end, or after_selection)",
-                        "enum": ["start", "end", "after_selection"],
-                        "default": "end"
-                    }
+# Where the detected application name is remembered between server runs
+APP_CACHE_PATH = Path.home() / ".cache" / "indesign-mcp" / "app.txt"
+
+_cached_app_name: Optional[str] = None
+
+
+# Tool definitions are static, so build them once at import time
+TOOLS = [
+    types.Tool(
+        name="add_text",
+        description="Add text to an InDesign document",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "text": {
+                    "type": "string",
+                    "description": "The text to add to the document"
                 },
-                "required": ["text"]
-            }
-        ),
-        types.Tool(
-            name="update_text",
-            description="Update existing text in an InDesign document",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "find_text": {
-                        "type": "string",
-                        "description": "Text to find and replace"
-                    },
-                    "replace_text": {
-                        "type": "string",
-                        "description": "Text to replace with"
-                    },
-                    "all_occurrences": {
-                        "type": "boolean",
-                        "description": "Replace all occurrences or just the first",
-                        "default": False
-                    }
+                "position": {
+                    "type": "string",
+                    "description": "Position to add text (start, end, or after_selection)",
+                    "enum": ["start", "end", "after_selection"],
+                    "default": "end"
+                }
+            },
+            "required": ["text"]
+        }
+    ),
+    types.Tool(
+        name="update_text",
+        description="Update existing text in an InDesign document",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "find_text": {
+                    "type": "string",
+                    "description": "Text to find and replace"
                 },
-                "required": ["find_text", "replace_text"]
-            }
-        ),
-        types.Tool(
-            name="remove_text",
-            description="Remove text from an InDesign document",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "text": {
-                        "type": "string",
-                        "description": "Text to remove from the document"
-                    },
-                    "all_occurrences": {
-                        "type": "boolean",
-                        "description": "Remove all occurrences or just the first",
-                        "default": False
-                    }
+                "replace_text": {
+                    "type": "string",
+                    "description": "Text to replace with"
                 },
-                "required": ["text"]
-            }
-        ),
-        types.Tool(
-            name="get_document_text",
-            description="Get all text content from the active InDesign document",
-            inputSchema={
-                "type": "object",
-                "properties": {}
-            }
-        ),
-        types.Tool(
-            name="indesign_status",
-            description="Check InDesign application status and document information",
-            inputSchema={
-                "type": "object",
-                "properties": {}
-            }
-        )
-    ]
+                "all_occurrences": {
+                    "type": "boolean",
+                    "description": "Replace all occurrences or just the first",
+                    "default": False
+                }
+            },
+            "required": ["find_text", "replace_text"]
+        }
+    ),
+    types.Tool(
+        name="remove_text",
+        description="Remove text from an InDesign document",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "text": {
+                    "type": "string",
+                    "description": "Text to remove from the document"
+                },
+                "all_occurrences": {
+                    "type": "boolean",
+                    "description": "Remove all occurrences or just the first",
+                    "default": False
+                }
+            },
+            "required": ["text"]
+        }
+    ),
+    types.Tool(
+        name="get_document_text",
+        description="Get all text content from the active InDesign document",
+        inputSchema={
+            "type": "object",
+            "properties": {}
+        }
+    ),
+    types.Tool(
+        name="indesign_status",
+        description="Check InDesign application status and document information",
+        inputSchema={
+            "type": "object",
+            "properties": {}
+        }
+    ),
+    types.Tool(
+        name="batch_ops",
+        description="Run several InDesign text operations in one round trip to InDesign",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "operations": {
+                    "type": "array",
+                    "description": "Operations to run, in order",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "name": {
+                                "type": "string",
+                                "description": "Name of the tool to run",
+                                "enum": ["add_text", "update_text", "remove_text", "get_document_text", "indesign_status"]
+                            },
+                            "arguments": {
+                                "type": "object",
+                                "description": "Arguments for the tool",
+                                "default": {}
+                            }
+                        },
+                        "required": ["name"]
+                    }
+                }
+            },
+            "required": ["operations"]
+        }
+    )
+]
 
 
-async def execute_extendscript(script: str) -> Dict[str, Any]:
-    """Execute ExtendScript in InDesign and return the result"""
+@app.list_tools()
+async def list_tools() -> list[types.Tool]:
+    """List available InDesign text manipulation tools"""
+    return TOOLS
+
+
+def _load_cached_app_name() -> Optional[str]:
+    """Return the last working InDesign application name, if known"""
+    global _cached_app_name
+    if _cached_app_name is None:
+        try:
+            name = APP_CACHE_PATH.read_text().strip()
+        except OSError:
+            return None
+        if name in INDESIGN_APPS:
+            _cached_app_name = name
+    return _cached_app_name
+
+
+def _store_cached_app_name(app_name: str) -> None:
+    """Remember the working InDesign application name in memory and on disk"""
+    global _cached_app_name
+    if app_name == _cached_app_name:
+        return
+    _cached_app_name = app_name
     try:
-        # Create a temporary script file
-        script_path = "/tmp/indesign_script.jsx"
-        with open(script_path, "w") as f:
-            f.write(script)
-        
-        # Try different InDesign application names
-        indesign_apps = [
-            "Adobe InDesign 2025",
-            "Adobe InDesign 2024",
-            "Adobe InDesign 2023", 
-            "Adobe InDesign CC 2024",
-            "Adobe InDesign CC 2023",
-            "Adobe InDesign"
-        ]
-        
-        result = None
-        for app_name in indesign_apps:
+        APP_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        APP_CACHE_PATH.write_text(app_name)
+    except OSError:
+        # The on-disk cache is only an optimisation
+        pass
+
+
+async def _run_osascript(program: str) -> Tuple[int, bytes, bytes]:
+    """Run a JavaScript for Automation program with a one-off osascript"""
+    # The program is piped in on stdin, so no temporary file is needed
+    proc = await asyncio.create_subprocess_exec(
+        "osascript", "-l", "JavaScript", "-",
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
+    try:
+        stdout, stderr = await asyncio.wait_for(proc.communicate(program.encode("utf-8")), timeout=30)
+    except (asyncio.TimeoutError, asyncio.CancelledError):
+        # Kill and reap the osascript so it doesn't linger
+        proc.kill()
+        await proc.wait()
+        raise
+    return proc.returncode, stdout, stderr
+
+
+async def _app_installed(app_name: str) -> bool:
+    """Check whether an application is installed, without launching it"""
+    returncode, _, _ = await _run_osascript(f"Application({json.dumps(app_name)}).id();")
+    return returncode == 0
+
+
+async def _probe_app_name() -> Optional[str]:
+    """Find which InDesign application is installed and remember it"""
+    # Check every candidate at once, but honour INDESIGN_APPS order: the
+    # first installed name in the list wins and the remaining checks are
+    # cancelled as soon as it is known
+    checks = {name: asyncio.create_task(_app_installed(name)) for name in INDESIGN_APPS}
+    try:
+        for app_name in INDESIGN_APPS:
             try:
-                cmd = [
-                    "osascript", "-e", 
-                    f'tell application "{app_name}" to do script alias POSIX file "{script_path}" language javascript'
-                ]
-                
-                result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
-                
-                if result.returncode == 0:
-                    break
-                    
-            except subprocess.TimeoutExpired:
-                continue
+                installed = await checks[app_name]
             except Exception:
                 continue
-        
-        # Clean up the temporary file
-        os.unlink(script_path)
-        
-        if result and result.returncode == 0:
-            return {"success": True, "result": result.stdout.strip()}
-        else:
-            error_msg = result.stderr.strip() if result else "Could not find InDesign application"
-            return {"success": False, "error": error_msg}
             
-    except subprocess.TimeoutExpired:
-        return {"success": False, "error": "Script execution timed out"}
-    except Exception as e:
-        return {"success": False, "error": str(e)}
+            if installed:
+                _store_cached_app_name(app_name)
+                return app_name
+        
+        return None
+    finally:
+        for check in checks.values():
+            check.cancel()
+        await asyncio.gather(*checks.values(), return_exceptions=True)
 
 
-@app.call_tool()
-async def call_tool(name: str, arguments: Dict[str, Any]) -> list[types.TextContent]:
-    """Handle tool calls for InDesign text manipulation"""
+# JXA program run by the helper osascript. It reads one JSON job per line
+# ({"app": ..., "script": ...}) from stdin, runs the script in InDesign via
+# doScript and writes one JSON reply per line to stdout. Jobs are sent
+# ASCII-only (json.dumps escapes everything else), so a read can never
+# split a multi-byte character.
+HELPER_SCRIPT = '''
+ObjC.import("Foundation");
+
+var stdin = $.NSFileHandle.fileHandleWithStandardInput;
+var stdout = $.NSFileHandle.fileHandleWithStandardOutput;
+var buffer = "";
+
+function readLine() {
+    while (buffer.indexOf("\\n") < 0) {
+        var data = stdin.availableData;
+        if (data.length === 0) {
+            return null;
+        }
+        buffer += $.NSString.alloc.initWithDataEncoding(data, $.NSUTF8StringEncoding).js;
+    }
+    var end = buffer.indexOf("\\n");
+    var line = buffer.slice(0, end);
+    buffer = buffer.slice(end + 1);
+    return line;
+}
+
+function reply(message) {
+    var text = $(JSON.stringify(message) + "\\n");
+    stdout.writeData(text.dataUsingEncoding($.NSUTF8StringEncoding));
+}
+
+var line;
+while ((line = readLine()) !== null) {
+    var job = JSON.parse(line);
+    try {
+        var result = Application(job.app).doScript(job.script, {language: "javascript"});
+        reply({ok: true, result: result === undefined || result === null ? "" : String(result)});
+    } catch (e) {
+        var message = String(e.message || e);
+        // JXA reports an application it cannot resolve as
+        // "Error -2700: Application can't be found."
+        reply({ok: false, error: message, appNotFound: /Application can.t be found/i.test(message)});
+    }
+}
+'''
+
+
+class ApplicationNotFoundError(Exception):
+    """The InDesign application a script was sent to could not be resolved"""
+
+
+class ScriptHelper:
+    """Long-lived osascript process that runs JSX jobs sent over its stdin"""
     
-    if name == "add_text":
-        text = arguments["text"]
-        position = arguments.get("position", "end")
-        
-        script = f'''
-        try {{
-            // Check if InDesign is running and has documents
-            if (app.documents.length === 0) {{
-                throw new Error("No documents are open in InDesign. Please open a document first.");
-            }}
-            
-            var doc = app.activeDocument;
-            if (!doc) {{
-                throw new Error("No active document found. Please make sure a document is active.");
-            }}
-            
-            // Check if document has text stories
-            if (doc.stories.length === 0) {{
-                throw new Error("Document has no text stories. Please add a text frame first.");
-            }}
-            
-            var story = doc.stories[0];
-            
-            var insertionPoint;
-            if ("{position}" === "start") {{
-                insertionPoint = story.insertionPoints[0];
-            }} else if ("{position}" === "end") {{
-                insertionPoint = story.insertionPoints[-1];
-            }} else {{
-                insertionPoint = story.insertionPoints[-1];
-            }}
-            
-            insertionPoint.contents = "{text}";
-            "Text added successfully to " + doc.name;
-        }} catch (e) {{
-            "Error: " + e.message;
-        }}
-        '''
-        
-        result = await execute_extendscript(script)
-        
-        if result["success"]:
-            return [types.TextContent(type="text", text=f"Successfully added text: '{text}'")]
-        else:
-            return [types.TextContent(type="text", text=f"Error adding text: {result['error']}")]
+    def __init__(self):
+        self._proc: Optional[asyncio.subprocess.Process] = None
+        # Created on first use: on Python 3.9 an asyncio.Lock binds to the
+        # event loop current at creation, which at import time is not the
+        # loop asyncio.run() later starts
+        self._lock: Optional[asyncio.Lock] = None
     
-    elif name == "update_text":
-        find_text = arguments["find_text"]
-        replace_text = arguments["replace_text"]
-        all_occurrences = arguments.get("all_occurrences", False)
-        
-        script = f'''
-        try {{
-            if (app.documents.length === 0) {{
-                throw new Error("No documents are open in InDesign. Please open a document first.");
-            }}
-            
-            var doc = app.activeDocument;
-            if (!doc) {{
-                throw new Error("No active document found.");
-            }}
-            
-            app.findGrepPreferences = NothingEnum.nothing;
-            app.changeGrepPreferences = NothingEnum.nothing;
-            
-            app.findGrepPreferences.findWhat = "{find_text}";
-            app.changeGrepPreferences.changeTo = "{replace_text}";
-            
-            var found = doc.changeGrep({"true" if all_occurrences else "false"});
-            
-            app.findGrepPreferences = NothingEnum.nothing;
-            app.changeGrepPreferences = NothingEnum.nothing;
-            
-            "Replaced " + found.length + " occurrence(s) in " + doc.name;
-        }} catch (e) {{
-            "Error: " + e.message;
-        }}
-        '''
-        
-        result = await execute_extendscript(script)
-        
-        if result["success"]:
-            return [types.TextContent(type="text", text=f"Successfully updated text: {result['result']}")]
-        else:
-            return [types.TextContent(type="text", text=f"Error updating text: {result['error']}")]
+    async def start(self) -> None:
+        """Start the helper process if it is not already running"""
+        if self._proc is not None and self._proc.returncode is None:
+            return
+        self._proc = await asyncio.create_subprocess_exec(
+            "osascript", "-l", "JavaScript", "-e", HELPER_SCRIPT,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+            # Replies can carry long results, so allow long lines
+            limit=64 * 1024 * 1024
+        )
     
-    elif name == "remove_text":
-        text = arguments["text"]
-        all_occurrences = arguments.get("all_occurrences", False)
-        
-        script = f'''
-        try {{
-            if (app.documents.length === 0) {{
-                throw new Error("No documents are open in InDesign. Please open a document first.");
-            }}
-            
-            var doc = app.activeDocument;
-            if (!doc) {{
-                throw new Error("No active document found.");
-            }}
-            
-            app.findGrepPreferences = NothingEnum.nothing;
-            app.changeGrepPreferences = NothingEnum.nothing;
-            
-            app.findGrepPreferences.findWhat = "{text}";
-            app.changeGrepPreferences.changeTo = "";
-            
-            var found = doc.changeGrep({"true" if all_occurrences else "false"});
-            
-            app.findGrepPreferences = NothingEnum.nothing;
-            app.changeGrepPreferences = NothingEnum.nothing;
-            
-            "Removed " + found.length + " occurrence(s) from " + doc.name;
-        }} catch (e) {{
-            "Error: " + e.message;
-        }}
-        '''
-        
-        result = await execute_extendscript(script)
-        
-        if result["success"]:
-            return [types.TextContent(type="text", text=f"Successfully removed text: {result['result']}")]
-        else:
-            return [types.TextContent(type="text", text=f"Error removing text: {result['error']}")]
+    async def close(self) -> None:
+        """Stop the helper process"""
+        proc, self._proc = self._proc, None
+        if proc is not None and proc.returncode is None:
+            proc.kill()
+            await proc.wait()
     
-    elif name == "get_document_text":
-        script = '''
-        try {
-            if (app.documents.length === 0) {
-                throw new Error("No documents are open in InDesign. Please open a document first.");
-            }
+    async def run(self, app_name: str, script: str, timeout: float = 30) -> Tuple[bool, str]:
+        """Run a script in the given InDesign application; returns (ok, result or error)
+
+        Raises ApplicationNotFoundError if the application can't be resolved.
+        """
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            await self.start()
+            job = json.dumps({"app": app_name, "script": script}) + "\n"
+            try:
+                self._proc.stdin.write(job.encode("ascii"))
+                await self._proc.stdin.drain()
+                line = await asyncio.wait_for(self._proc.stdout.readline(), timeout=timeout)
+            except BaseException:
+                # A hung or half-answered job leaves the pipe out of sync
+                await self.close()
+                raise
             
-            var doc = app.activeDocument;
-            if (!doc) {
-                throw new Error("No active document found.");
-            }
+            if not line:
+                await self.close()
+                return False, "osascript helper exited unexpectedly"
             
-            if (doc.stories.length === 0) {
-                return "Document '" + doc.name + "' has no text content.";
+            reply = json.loads(line)
+            if reply.get("ok"):
+                return True, reply.get("result", "").strip()
+            if reply.get("appNotFound"):
+                raise ApplicationNotFoundError(reply.get("error", f"Could not find {app_name}"))
+            return False, reply.get("error", "Unknown error")
+
+
+_helper = ScriptHelper()
+
+# InDesign runs one script at a time, so let one call at a time talk to it.
+# Waiting callers queue here instead of piling up osascript probes and
+# AppleEvents, and after a cold start they find the probed name cached.
+# Created on first use, once the event loop is running (see ScriptHelper).
+_indesign_semaphore: Optional[asyncio.Semaphore] = None
+
+
+def _get_indesign_semaphore() -> asyncio.Semaphore:
+    """Return the semaphore guarding access to InDesign, creating it if needed"""
+    global _indesign_semaphore
+    if _indesign_semaphore is None:
+        _indesign_semaphore = asyncio.Semaphore(1)
+    return _indesign_semaphore
+
+
+# ExtendScript has no native JSON object; define a minimal JSON.stringify
+# so scripts can hand structured results back to Python
+JSX_JSON_POLYFILL = r'''
+if (typeof JSON !== "object") {
+    JSON = {};
+}
+if (typeof JSON.stringify !== "function") {
+    JSON.stringify = function (value) {
+        function quote(s) {
+            return '"' + String(s).replace(/[\\"\u0000-\u001f\u2028\u2029]/g, function (c) {
+                var escapes = {"\\": "\\\\", '"': '\\"', "\n": "\\n", "\r": "\\r", "\t": "\\t"};
+                return escapes[c] || "\\u" + ("0000" + c.charCodeAt(0).toString(16)).slice(-4);
+            }) + '"';
+        }
+        function serialize(v) {
+            if (v === null || v === undefined) return "null";
+            if (typeof v === "number") return isFinite(v) ? String(v) : "null";
+            if (typeof v === "boolean") return String(v);
+            if (typeof v === "string") return quote(v);
+            var parts = [];
+            if (v instanceof Array) {
+                for (var i = 0; i < v.length; i++) parts.push(serialize(v[i]));
+                return "[" + parts.join(",") + "]";
             }
-            
-            var allText = "=== Content from '" + doc.name + "' ===\\n\\n";
-            for (var i = 0; i < doc.stories.length; i++) {
-                allText += "Story " + (i + 1) + ":\\n";
-                allText += doc.stories[i].contents + "\\n\\n";
+            for (var k in v) {
+                if (v.hasOwnProperty(k)) parts.push(quote(k) + ":" + serialize(v[k]));
             }
-            
-            allText;
-        } catch (e) {
-            "Error: " + e.message;
+            return "{" + parts.join(",") + "}";
         }
-        '''
+        return serialize(value);
+    };
+}
+'''
+
+
+# Functions shared by the tool scripts. They are defined once per InDesign
+# session in a persistent ExtendScript engine, so each call only sends a
+# short script that uses them.
+JSX_ENGINE = "indesign_mcp"
+
+JSX_SHARED_FUNCTIONS = JSX_JSON_POLYFILL + '''
+function mcpActiveDocument() {
+    if (app.documents.length === 0) {
+        throw new Error("No documents are open in InDesign. Please open a document first.");
+    }
+    
+    var doc = app.activeDocument;
+    if (!doc) {
+        throw new Error("No active document found.");
+    }
+    return doc;
+}
+
+function mcpResetGrep() {
+    app.findGrepPreferences = NothingEnum.nothing;
+    app.changeGrepPreferences = NothingEnum.nothing;
+}
+
+function mcpReplace(find, change, all) {
+    var doc = mcpActiveDocument();
+    app.findGrepPreferences.findWhat = find;
+    app.changeGrepPreferences.changeTo = change;
+    return {count: doc.changeGrep(all).length, doc: doc.name};
+}
+'''
+
+# Identifies this version of the shared functions, so a session still
+# holding an older set gets them redefined
+JSX_SHARED_FUNCTIONS_ID = hashlib.sha1(JSX_SHARED_FUNCTIONS.encode("utf-8")).hexdigest()[:12]
+
+JSX_BOOTSTRAP_SCRIPT = (
+    f'#targetengine "{JSX_ENGINE}"\n'
+    + JSX_SHARED_FUNCTIONS
+    + f'var mcpSharedFunctionsId = "{JSX_SHARED_FUNCTIONS_ID}";\n"ok";\n'
+)
+
+# Returned by a session script when the shared functions are missing
+BOOTSTRAP_NEEDED = "__indesign_mcp_bootstrap_needed__"
+
+# Runs a script in the persistent engine, provided the shared functions exist
+SESSION_SCRIPT = Template(f'''#targetengine "{JSX_ENGINE}"
+if (typeof mcpSharedFunctionsId === "undefined" || mcpSharedFunctionsId !== "{JSX_SHARED_FUNCTIONS_ID}") {{
+    "{BOOTSTRAP_NEEDED}";
+}} else {{
+$script
+}}
+''')
+
+
+async def _run_in_session(app_name: str, script: str) -> Tuple[bool, str]:
+    """Run a script in the server's InDesign engine, defining the shared functions first if needed"""
+    ok, output = await _helper.run(app_name, SESSION_SCRIPT.substitute(script=script))
+    if ok and output == BOOTSTRAP_NEEDED:
+        ok, output = await _helper.run(app_name, JSX_BOOTSTRAP_SCRIPT)
+        if ok:
+            ok, output = await _helper.run(app_name, SESSION_SCRIPT.substitute(script=script))
+    return ok, output
+
+
+async def execute_extendscript(script: str) -> Dict[str, Any]:
+    """Execute ExtendScript in InDesign and return the result
+
+    The script must evaluate to a JSON envelope, either {"ok": true,
+    "result": ...} or {"ok": false, "error": "..."}.
+    """
+    try:
+        async with _get_indesign_semaphore():
+            app_name = _load_cached_app_name() or await _probe_app_name()
+            if app_name is None:
+                return {"success": False, "error": "Could not find InDesign application"}
+            
+            try:
+                ok, output = await _run_in_session(app_name, script)
+            except ApplicationNotFoundError as e:
+                # The remembered application may have been replaced by another
+                # version; any other failure is reported as is, without probing
+                probed = await _probe_app_name()
+                if probed is None or probed == app_name:
+                    return {"success": False, "error": str(e)}
+                ok, output = await _run_in_session(probed, script)
         
-        result = await execute_extendscript(script)
+        if not ok:
+            return {"success": False, "error": output}
         
-        if result["success"]:
-            return [types.TextContent(type="text", text=f"Document text content:\\n{result['result']}")]
-        else:
-            return [types.TextContent(type="text", text=f"Error getting document text: {result['error']}")]
+        try:
+            reply = json.loads(output)
+        except ValueError:
+            return {"success": False, "error": f"Unexpected output from InDesign: {output}"}
+        
+        if reply.get("ok"):
+            return {"success": True, "result": reply.get("result")}
+        return {"success": False, "error": reply.get("error", "Unknown error")}
     
-    elif name == "indesign_status":
-        script = '''
-        try {
-            var status = "=== InDesign Status ===\\n";
-            status += "Application: " + app.name + " " + app.version + "\\n";
-            status += "Documents open: " + app.documents.length + "\\n";
-            
-            if (app.documents.length > 0) {
-                var doc = app.activeDocument;
-                status += "Active document: " + doc.name + "\\n";
-                status += "Document stories: " + doc.stories.length + "\\n";
-                status += "Document pages: " + doc.pages.length + "\\n";
-                
-                if (doc.stories.length > 0) {
-                    status += "\\nFirst story preview: " + doc.stories[0].contents.substring(0, 100) + "...\\n";
-                }
-            } else {
-                status += "\\nNo documents are currently open.\\n";
-                status += "Please open or create a document in InDesign.\\n";
-            }
-            
-            status;
-        } catch (e) {
-            "Error checking InDesign status: " + e.message;
-        }
-        '''
+    except asyncio.TimeoutError:
+        return {"success": False, "error": "Script execution timed out"}
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+
+# JSX for each tool, as the body of a function that returns the tool's
+# result as a plain object. User input is substituted already quoted with
+# json.dumps, since a JSON string is also a valid JavaScript string literal.
+ADD_TEXT_SCRIPT = Template('''
+var doc = mcpActiveDocument();
+
+// Check if document has text stories
+if (doc.stories.length === 0) {
+    throw new Error("Document has no text stories. Please add a text frame first.");
+}
+
+var story = doc.stories[0];
+
+var insertionPoint;
+if ($position === "start") {
+    insertionPoint = story.insertionPoints[0];
+} else if ($position === "end") {
+    insertionPoint = story.insertionPoints[-1];
+} else {
+    insertionPoint = story.insertionPoints[-1];
+}
+
+insertionPoint.contents = $text;
+return {doc: doc.name};
+''')
+
+UPDATE_TEXT_SCRIPT = Template('''
+return mcpReplace($find_text, $replace_text, $all_occurrences);
+''')
+
+REMOVE_TEXT_SCRIPT = Template('''
+return mcpReplace($text, "", $all_occurrences);
+''')
+
+# Document text can be book-length, so it is written to a temporary file
+# and only the file's path is passed back through osascript
+GET_DOCUMENT_TEXT_SCRIPT = '''
+var doc = mcpActiveDocument();
+if (doc.stories.length === 0) {
+    return {doc: doc.name, stories: 0};
+}
+
+// Remove output left behind by calls whose result was never read,
+// e.g. a batch that timed out; recent files may still be in use
+var stale = Folder.temp.getFiles("indesign_mcp_*.txt");
+var cutoff = new Date().getTime() - 5 * 60 * 1000;
+for (var j = 0; j < stale.length; j++) {
+    if (stale[j].modified && stale[j].modified.getTime() < cutoff) {
+        stale[j].remove();
+    }
+}
+
+var file = new File(Folder.temp.fsName + "/indesign_mcp_" + new Date().getTime() + "_" + Math.floor(Math.random() * 1000000) + ".txt");
+file.encoding = "UTF-8";
+file.lineFeed = "Unix";
+if (!file.open("w")) {
+    throw new Error("Could not write document text to " + file.fsName);
+}
+
+file.write("=== Content from '" + doc.name + "' ===\\n\\n");
+for (var i = 0; i < doc.stories.length; i++) {
+    file.write("Story " + (i + 1) + ":\\n");
+    file.write(doc.stories[i].contents + "\\n\\n");
+}
+
+file.close();
+return {doc: doc.name, stories: doc.stories.length, path: file.fsName};
+'''
+
+INDESIGN_STATUS_SCRIPT = '''
+var status = {application: app.name, version: app.version, documents: app.documents.length};
+
+if (app.documents.length > 0) {
+    var doc = app.activeDocument;
+    status.activeDocument = {name: doc.name, stories: doc.stories.length, pages: doc.pages.length};
+
+    if (doc.stories.length > 0) {
+        status.activeDocument.preview = doc.stories[0].contents.substring(0, 100);
+    }
+}
+
+return status;
+'''
+
+# Clears InDesign's GREP find/change preferences. Tool scripts only set
+# findWhat and changeTo, so this runs once before and once after all the
+# operations of a script rather than around each one
+RESET_GREP_PREFERENCES = "mcpResetGrep();"
+
+# Tools whose scripts use the GREP find/change preferences
+GREP_TOOLS = {"update_text", "remove_text"}
+
+# Runs a single tool body and returns its result or error as JSON
+SINGLE_SCRIPT = Template('''
+var result;
+$setup
+try {
+    result = {ok: true, result: (function () { $body })()};
+} catch (e) {
+    result = {ok: false, error: String(e.message || e)};
+}
+$cleanup
+JSON.stringify(result);
+''')
+
+# Runs all operations of a batch as one undo step, so InDesign records a
+# single history entry for the whole batch
+BATCH_SCRIPT = Template('''
+var results = [];
+app.doScript(function () {
+    $setup
+    $operations
+    $cleanup
+}, ScriptLanguage.JAVASCRIPT, [], UndoModes.ENTIRE_SCRIPT, "Batch MCP ops");
+JSON.stringify({ok: true, result: results});
+''')
+
+# Runs one operation of a batch and records its result or error
+BATCH_OP_SCRIPT = Template('''
+try {
+    results.push({op: $index, ok: true, result: (function () { $body })()});
+} catch (e) {
+    results.push({op: $index, ok: false, error: String(e.message || e)});
+}
+''')
+
+
+def _add_text_script(arguments: Dict[str, Any]) -> str:
+    return ADD_TEXT_SCRIPT.substitute(
+        text=json.dumps(arguments["text"]),
+        position=json.dumps(arguments.get("position", "end"))
+    )
+
+
+async def _add_text_reply(arguments: Dict[str, Any], result: Dict[str, Any]) -> types.TextContent:
+    if result["success"]:
+        return types.TextContent(type="text", text=f"Successfully added text: '{arguments['text']}'")
+    return types.TextContent(type="text", text=f"Error adding text: {result['error']}")
+
+
+def _update_text_script(arguments: Dict[str, Any]) -> str:
+    return UPDATE_TEXT_SCRIPT.substitute(
+        find_text=json.dumps(arguments["find_text"]),
+        replace_text=json.dumps(arguments["replace_text"]),
+        all_occurrences=json.dumps(bool(arguments.get("all_occurrences", False)))
+    )
+
+
+async def _update_text_reply(arguments: Dict[str, Any], result: Dict[str, Any]) -> types.TextContent:
+    if result["success"]:
+        replaced = result["result"]
+        return types.TextContent(
+            type="text",
+            text=f"Successfully updated text: Replaced {replaced['count']} occurrence(s) in {replaced['doc']}"
+        )
+    return types.TextContent(type="text", text=f"Error updating text: {result['error']}")
+
+
+def _remove_text_script(arguments: Dict[str, Any]) -> str:
+    return REMOVE_TEXT_SCRIPT.substitute(
+        text=json.dumps(arguments["text"]),
+        all_occurrences=json.dumps(bool(arguments.get("all_occurrences", False)))
+    )
+
+
+async def _remove_text_reply(arguments: Dict[str, Any], result: Dict[str, Any]) -> types.TextContent:
+    if result["success"]:
+        removed = result["result"]
+        return types.TextContent(
+            type="text",
+            text=f"Successfully removed text: Removed {removed['count']} occurrence(s) from {removed['doc']}"
+        )
+    return types.TextContent(type="text", text=f"Error removing text: {result['error']}")
+
+
+def _get_document_text_script(arguments: Dict[str, Any]) -> str:
+    return GET_DOCUMENT_TEXT_SCRIPT
+
+
+async def _get_document_text_reply(arguments: Dict[str, Any], result: Dict[str, Any]) -> types.TextContent:
+    if not result["success"]:
+        return types.TextContent(type="text", text=f"Error getting document text: {result['error']}")
+    
+    content = result["result"]
+    if not content.get("path"):
+        return types.TextContent(type="text", text=f"Document text content:\nDocument '{content['doc']}' has no text content.")
+    
+    # The script wrote the text to a file and returned its path
+    path = Path(content["path"])
+    try:
+        text = await asyncio.to_thread(path.read_text, encoding="utf-8-sig")
+    except OSError as e:
+        return types.TextContent(type="text", text=f"Error getting document text: {e}")
+    finally:
+        path.unlink(missing_ok=True)
+    return types.TextContent(type="text", text=f"Document text content:\n{text}")
+
+
+def _indesign_status_script(arguments: Dict[str, Any]) -> str:
+    return INDESIGN_STATUS_SCRIPT
+
+
+async def _indesign_status_reply(arguments: Dict[str, Any], result: Dict[str, Any]) -> types.TextContent:
+    if not result["success"]:
+        return types.TextContent(type="text", text=f"Error checking InDesign status: {result['error']}")
+    
+    status = result["result"]
+    lines = [
+        "=== InDesign Status ===",
+        f"Application: {status['application']} {status['version']}",
+        f"Documents open: {status['documents']}"
+    ]
+    
+    doc = status.get("activeDocument")
+    if doc:
+        lines.append(f"Active document: {doc['name']}")
+        lines.append(f"Document stories: {doc['stories']}")
+        lines.append(f"Document pages: {doc['pages']}")
+        
+        if "preview" in doc:
+            lines.append("")
+            lines.append(f"First story preview: {doc['preview']}...")
+    else:
+        lines.append("")
+        lines.append("No documents are currently open.")
+        lines.append("Please open or create a document in InDesign.")
+    
+    return types.TextContent(type="text", text="\n".join(lines))
+
+
+ScriptBuilder = Callable[[Dict[str, Any]], str]
+ReplyFormatter = Callable[[Dict[str, Any], Dict[str, Any]], Awaitable[types.TextContent]]
+
+# Script builder and reply formatter for every tool that runs JSX in InDesign
+TOOL_HANDLERS: Dict[str, Tuple[ScriptBuilder, ReplyFormatter]] = {
+    "add_text": (_add_text_script, _add_text_reply),
+    "update_text": (_update_text_script, _update_text_reply),
+    "remove_text": (_remove_text_script, _remove_text_reply),
+    "get_document_text": (_get_document_text_script, _get_document_text_reply),
+    "indesign_status": (_indesign_status_script, _indesign_status_reply),
+}
+
+
+async def run_batch(operations: list[Dict[str, Any]]) -> list[types.TextContent]:
+    """Run several tool operations in InDesign with a single script execution"""
+    if not operations:
+        return [types.TextContent(type="text", text="No operations to run: batch_ops needs at least one operation")]
+    
+    ops = []
+    replies: list[Optional[types.TextContent]] = []
+    for index, op in enumerate(operations):
+        name = op.get("name", "")
+        arguments = op.get("arguments") or {}
+        handler = TOOL_HANDLERS.get(name)
+        if handler is None:
+            replies.append(types.TextContent(type="text", text=f"Operation {index}: Unknown tool: {name}"))
+            continue
+        build_script, format_reply = handler
+        try:
+            body = build_script(arguments)
+        except KeyError as e:
+            replies.append(types.TextContent(type="text", text=f"Operation {index} ({name}): missing argument {e}"))
+            continue
+        ops.append((index, name, arguments, body, format_reply))
+        replies.append(None)
+    
+    if ops:
+        grep_reset = RESET_GREP_PREFERENCES if any(op[1] in GREP_TOOLS for op in ops) else ""
+        script = BATCH_SCRIPT.substitute(
+            setup=grep_reset,
+            operations="".join(BATCH_OP_SCRIPT.substitute(index=index, body=body) for index, _, _, body, _ in ops),
+            cleanup=grep_reset
+        )
         
         result = await execute_extendscript(script)
+        if not result["success"]:
+            # Keep one reply per operation, including those already rejected
+            for index, name, _, _, _ in ops:
+                replies[index] = types.TextContent(
+                    type="text",
+                    text=f"Operation {index} ({name}): Error running batch: {result['error']}"
+                )
+            return replies
         
-        if result["success"]:
-            return [types.TextContent(type="text", text=result['result'])]
-        else:
-            return [types.TextContent(type="text", text=f"Error checking InDesign status: {result['error']}")]
+        entries = {entry["op"]: entry for entry in result["result"]}
+        for index, _, arguments, _, format_reply in ops:
+            entry = entries.get(index, {"ok": False, "error": "No result returned"})
+            if entry["ok"]:
+                op_result = {"success": True, "result": entry.get("result")}
+            else:
+                op_result = {"success": False, "error": entry.get("error", "Unknown error")}
+            replies[index] = await format_reply(arguments, op_result)
     
-    else:
+    return replies
+
+
+@app.call_tool()
+async def call_tool(name: str, arguments: Dict[str, Any]) -> list[types.TextContent]:
+    """Handle tool calls for InDesign text manipulation"""
+    
+    if name == "batch_ops":
+        return await run_batch(arguments["operations"])
+    
+    handler = TOOL_HANDLERS.get(name)
+    if handler is None:
         return [types.TextContent(type="text", text=f"Unknown tool: {name}")]
+    
+    build_script, format_reply = handler
+    grep_reset = RESET_GREP_PREFERENCES if name in GREP_TOOLS else ""
+    script = SINGLE_SCRIPT.substitute(setup=grep_reset, body=build_script(arguments), cleanup=grep_reset)
+    result = await execute_extendscript(script)
+    return [await format_reply(arguments, result)]
 
 
 async def main():
-    async with stdio_server() as streams:
-        await app.run(
-            streams[0], streams[1], app.create_initialization_options()
-        )
+    await _helper.start()
+    try:
+        async with stdio_server() as streams:
+            await app.run(
+                streams[0], streams[1], app.create_initialization_options()
+            )
+    finally:
+        await _helper.close()
 
 
 if __name__ == "__main__":